@@ -11,6 +11,7 @@ alignment_strength = 1.0
 cohesion_strength = 1.0
 evasion_strength = 100.0
 pursuit_strength = evasion_strength
+look_ahead_time = 1000.0  # in ms, how far into the future actors predict collisions (independent of the step size)
 
 
 class Actor:
@@ -30,7 +31,7 @@ class Actor:
         self.view_dist = float(view_distance)  # how far the actor can see
         self.view_dist_sq = self.view_dist ** 2
         self.view_angle = float(view_angle)  # in radians
-        self.ahead = self.v  # look ahead vector to avoid collision
+        self.ahead = self.v * look_ahead_time  # look ahead vector to avoid collision
 
         self.mass = mass  # influences
         self.color = color  # color for display
@@ -61,9 +62,24 @@ class Actor:
             self.v = (self.sim.center - self.pos).normalize() * self.max_speed
 
         self.pos += self.v * dt  # update the position
-        self.ahead = 50 * self.v * dt  # update the ahead vector
+        self.ahead = self.v * look_ahead_time  # update the ahead vector
 
     def calc_avoidance(self):
+        threat, threat_dist_sq = self.find_threat()
+
+        if type(threat) is Wall:
+            threat_dist = math.sqrt(threat_dist_sq)
+            avoidance = (threat.orthonormal_vector_to(self.pos)) * avoidance_strength / threat_dist
+            return avoidance
+        elif type(threat) is Circle:
+            threat_dist = math.sqrt(threat_dist_sq)
+            avoidance = (self.pos - threat.pos).normalize() * avoidance_strength / threat_dist
+            return avoidance
+        else:
+            return Vector(0, 0)
+
+    def find_threat(self):
+        """Finds the closest obstacle that is in the way of the ahead vector."""
         small_ahead = self.ahead / 2
         threat = None
         threat_dist_sq = None
@@ -84,16 +100,7 @@ class Actor:
                         threat = obstacle
                         threat_dist_sq = dist_sq
 
-        if type(threat) is Wall:
-            threat_dist = math.sqrt(threat_dist_sq)
-            avoidance = (threat.orthonormal_vector_to(self.pos)) * avoidance_strength / threat_dist
-            return avoidance
-        elif type(threat) is Circle:
-            threat_dist = math.sqrt(threat_dist_sq)
-            avoidance = (self.pos - threat.pos).normalize() * avoidance_strength / threat_dist
-            return avoidance
-        else:
-            return Vector(0, 0)
+        return threat, threat_dist_sq
 
     def in_fov(self, point):
         """Checks if a given point is in the field of view"""
@@ -240,18 +247,18 @@ class Predator(Actor):
 
     def update(self, dt):
         if self.update_this_frame:
-            self.forces += self.calc_pursuit(dt)
+            self.forces += self.calc_pursuit()
         Actor.update(self, dt)
         self.update_this_frame = not self.update_this_frame
 
-    def calc_pursuit(self, dt):
+    def calc_pursuit(self):
         """Calculate the pursuit force which makes them pursuit the closest boid"""
         target, dist_sq = self.find_target()
         if target is None:
             pursuit = Vector(0, 0)
         else:
             dist = math.sqrt(dist_sq)
-            direction = self.pos.direction_to(target.pos + target.v * 50 * dt)
+            direction = self.pos.direction_to(target.pos + target.v * look_ahead_time)
             pursuit = pursuit_strength * direction / dist
 
         return pursuit
@@ -0,0 +1,273 @@
+"""Headless benchmarks of the simulation (no pygame window needed).
+
+Usage:
+    python benchmarks.py fast-forward --warp 100 --seconds 60
+    python benchmarks.py species --nagents 20000
+    python benchmarks.py ensemble --replicates 500
+    python benchmarks.py differential --candidate vector --budget position=0.001
+    python benchmarks.py server --rate 48
+"""
+import argparse
+import sys
+import time
+import numpy as np
+import differential
+import server
+from ensemble import Ensemble
+from simulation import Simulation
+from species import boid_species, predator_species
+from vector_simulation import VectorSimulation, neighbor_pairs
+
+
+def fast_forward(nboids=150, window_size=(1080, 720), fps=48, time_warp=100, sim_seconds=60, seed=0):
+    """Runs the simulation fast-forwarded for `sim_seconds` simulated seconds, frame by frame like main.main would
+    (advancing by the measured time of the last frame and waiting for the rest of a frame, like pg.time.Clock.tick),
+    and returns the simulation, whose stepper contains the throughput statistics."""
+    np.random.seed(seed)
+    sim = Simulation(window_size, nboids)
+    sim.setup()
+    sim.set_time_warp(time_warp)
+
+    frame_time = 1000 / fps  # wall-clock ms per frame
+    last_frame = time.perf_counter()
+    while sim.stepper.sim_time + sim.stepper.dropped_time < sim_seconds * 1000:
+        time.sleep(max(0.0, last_frame + frame_time / 1000 - time.perf_counter()))
+        now = time.perf_counter()
+        elapsed, last_frame = (now - last_frame) * 1000, now
+        sim.advance(elapsed)
+
+    return sim
+
+
+def report_fast_forward(args):
+    sim = fast_forward(nboids=args.nboids, fps=args.fps, time_warp=args.warp, sim_seconds=args.seconds,
+                       seed=args.seed)
+    stepper = sim.stepper
+    reachable = [warp for warp in (1, 2, 5, 10, 100) if sim.reachable(warp, 1000 / args.fps)]
+    print(f"time warp:                    x{stepper.time_warp:g} "
+          f"(stepped by {'VectorSimulation' if stepper.time_warp > 1 else 'Simulation'})")
+    print(f"reachable time warps:         {', '.join(f'x{warp:g}' for warp in reachable)} (like the F key in main.py)")
+    print(f"fixed step:                   {stepper.fixed_dt:g} ms")
+    print(f"simulated:                    {stepper.sim_time / 1000:.1f} s")
+    print(f"dropped (couldn't keep up):   {stepper.dropped_time / 1000:.1f} s")
+    print(f"throughput:                   {stepper.throughput():.2f} simulated s per wall-clock s")
+    print(f"capacity (stepping only):     {stepper.capacity():.2f} simulated s per wall-clock s spent stepping")
+
+
+def mixed_species(n_boid_species, n_predator_species):
+    """Boid and predator species that differ in their speeds, fields of view and rule strengths. All of them see as
+    far as the default ones, so the neighbor search of a mixed-species scene finds as many pairs as the one of a
+    single species."""
+    boids = [boid_species(f"boid {k}", max_speed=0.08 + 0.02 * k, view_angle=np.pi * (1.5 - 0.1 * k),
+                          separation_strength=4.0 + k, separation_radius=15.0 + 3 * k,
+                          alignment_strength=1.0 + 0.5 * k, cohesion_strength=1.0 - 0.1 * k)
+             for k in range(n_boid_species)]
+    predators = [predator_species(f"predator {k}", max_speed=0.1 + 0.02 * k, view_angle=np.pi * (1 - 0.2 * k),
+                                  pursuit_strength=100.0 + 20 * k)
+                 for k in range(n_predator_species)]
+    return boids, predators
+
+
+def species_step_time(nagents, npredators, n_boid_species, n_predator_species, window_size=(1920, 1080), steps=10,
+                      seed=0):
+    """Returns the average wall-clock time in s of a step of a VectorSimulation with the given number of species,
+    together with the number of pairs of boids within view distance and the number of pairs that flock (neighbors
+    of the same species in the field of view) at the start."""
+    np.random.seed(seed)
+    sim = VectorSimulation(window_size, 0)
+    sim.setup()
+    boids, predators = mixed_species(n_boid_species, n_predator_species)
+    for count, species in ((nagents - npredators, boids), (npredators, predators)):
+        positions = np.random.uniform((0, 0), window_size, (count, 2))
+        velocities = np.random.uniform(-1, 1, (count, 2))
+        for k, part in enumerate(np.array_split(np.arange(count), len(species))):
+            sim.add_actors(species[k], positions[part], velocities[part])
+
+    everyone = np.arange(sim.n_boids)
+    candidates = len(neighbor_pairs(sim.pos[:sim.n_boids], everyone, sim.params["view_distance"][:sim.n_boids].max(),
+                                    sim.window_size)[0])
+    neighbors = len(sim.find_neighbors(everyone)[0])
+
+    sim.step(sim.stepper.fixed_dt)  # warm up
+    start = time.perf_counter()
+    for _ in range(steps):
+        sim.step(sim.stepper.fixed_dt)
+    return (time.perf_counter() - start) / steps, candidates, neighbors
+
+
+def report_species(args):
+    single, single_candidates, single_neighbors = species_step_time(args.nagents, args.npredators, 1, 1,
+                                                                    steps=args.steps, seed=args.seed)
+    mixed, mixed_candidates, mixed_neighbors = species_step_time(args.nagents, args.npredators, args.boid_species,
+                                                                 args.predator_species, steps=args.steps,
+                                                                 seed=args.seed)
+    print(f"actors:                       {args.nagents} ({args.npredators} predators)")
+    print(f"single species:               {single * 1000:.1f} ms per step, {single_candidates} pairs in view distance, "
+          f"{single_neighbors} flocking")
+    print(f"mixed species:                {mixed * 1000:.1f} ms per step, {mixed_candidates} pairs in view distance, "
+          f"{mixed_neighbors} flocking ({args.boid_species} boid and {args.predator_species} predator species)")
+    print(f"mixed / single:               {mixed / single:.2f} (time), {mixed_neighbors / single_neighbors:.2f} "
+          f"(flocking pairs)")
+
+
+def replicate_steps_per_second(make_sims, nreplicates, steps, dt=20.0):
+    """Steps `nreplicates` simulations created by make_sims `steps` times and returns the replicate-steps per second.
+    make_sims returns a list of objects with a step method, which each count as `nreplicates / len(list)` replicates.
+    """
+    sims = make_sims()
+    for sim in sims:
+        sim.step(dt)  # warm up
+    start = time.perf_counter()
+    for _ in range(steps):
+        for sim in sims:
+            sim.step(dt)
+    return nreplicates * steps / (time.perf_counter() - start)
+
+
+def report_ensemble(args):
+    window_size = (1080, 720)
+
+    def ensemble():
+        sims = Ensemble(window_size, args.nboids, args.replicates)
+        sims.setup(range(args.seed, args.seed + args.replicates))
+        return [sims]
+
+    def separate(simulation_class, nreplicates):
+        def make_sims():
+            sims = []
+            for r in range(nreplicates):
+                np.random.seed(args.seed + r)
+                sims.append(simulation_class(window_size, args.nboids))
+                sims[-1].setup()
+            return sims
+        return make_sims
+
+    nseparate = min(args.replicates, 10)
+    rates = {f"ensemble of {args.replicates}": replicate_steps_per_second(ensemble, args.replicates, args.steps),
+             f"{nseparate} separate VectorSimulations": replicate_steps_per_second(
+                 separate(VectorSimulation, nseparate), nseparate, args.steps),
+             f"{nseparate} separate Simulations": replicate_steps_per_second(
+                 separate(Simulation, nseparate), nseparate, max(1, args.steps // 10))}
+
+    reference = rates[f"{nseparate} separate Simulations"]
+    print(f"{args.nboids} boids per replicate")
+    for name, rate in rates.items():
+        print(f"{name + ':':37} {rate:10.1f} replicate-steps per s (x{rate / reference:.1f})")
+
+
+def budget_item(item):
+    """Parses a METRIC=VALUE budget override of the differential benchmark."""
+    metric, separator, value = item.partition("=")
+    if not separator or metric not in differential.DivergenceReport.metrics:
+        raise argparse.ArgumentTypeError(
+            f"expected METRIC=VALUE with METRIC one of {', '.join(differential.DivergenceReport.metrics)}")
+    try:
+        return metric, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid budget value {value!r}") from None
+
+
+def report_differential(args):
+    """Checks the candidate against simultaneous_step, with its default neighbor search and with the grid, and reports
+    the divergence from Simulation.step. Only the resynced runs against simultaneous_step are checked against the
+    budget, a free-running one is only reported."""
+    npredators = args.npredators if args.npredators is not None else (0 if args.candidate == "ensemble" else 1)
+    budget = None
+    if not args.free_running:
+        budget = dict(differential.default_budget)
+        budget.update(args.budget)
+
+    exceeded = []
+    for sequential, grid in ((False, False), (False, True), (True, False)):
+        reference = differential.reference_scene(nboids=args.nboids, npredators=npredators, seed=args.seed)
+        report = differential.compare(reference, differential.candidates[args.candidate], steps=args.steps,
+                                      resync=not args.free_running, sequential=sequential, grid=grid,
+                                      budget=None if sequential else budget)
+        print(report.summary())
+        exceeded += [f"{metric}{' (grid)' if grid else ''}" for metric in report.exceeded()]
+    if exceeded:
+        sys.exit(f"divergence exceeded the budget: {', '.join(exceeded)}")
+
+
+def report_server(args):
+    """Doubles the number of sessions until the server can't keep up with the tick rate any more, then bisects."""
+    steps_per_second = 1000 / VectorSimulation().stepper.fixed_dt  # the fixed steps of a watched session
+    rate = steps_per_second if args.watched else steps_per_second / server.SimulationServer().idle_every
+
+    def sustained(nsessions):
+        slowest, fastest, late = server.load_test(nsessions, args.seconds, args.nboids, args.rate, args.watched)
+        ok = slowest >= 0.98 * rate and late <= 0.05  # every session at the full rate, hardly any late ticks
+        print(f"{nsessions:6} sessions: {slowest:5.1f} to {fastest:5.1f} steps per s, {late:4.0%} late ticks"
+              f"{'' if ok else '   (not sustained)'}")
+        return ok
+
+    low, high = 0, 1
+    while sustained(high):
+        low, high = high, high * 2
+    while high - low > 1:
+        middle = (low + high) // 2
+        if sustained(middle):
+            low = middle
+        else:
+            high = middle
+
+    state = "watched" if args.watched else "unwatched"
+    print(f"one core sustains {low} {state} sessions of {args.nboids} boids at {rate:g} steps per s "
+          f"({args.rate} ticks per s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    ff = subparsers.add_parser("fast-forward", help="simulated seconds per wall-clock second at a given time warp")
+    ff.add_argument("--nboids", type=int, default=150)
+    ff.add_argument("--fps", type=int, default=48)
+    ff.add_argument("--warp", type=float, default=100)
+    ff.add_argument("--seconds", type=float, default=60, help="simulated seconds to run")
+    ff.add_argument("--seed", type=int, default=0)
+    ff.set_defaults(func=report_fast_forward)
+
+    sp = subparsers.add_parser("species", help="step time of a mixed-species scene compared to a single species")
+    sp.add_argument("--nagents", type=int, default=20000)
+    sp.add_argument("--npredators", type=int, default=20)
+    sp.add_argument("--boid-species", type=int, default=4)
+    sp.add_argument("--predator-species", type=int, default=2)
+    sp.add_argument("--steps", type=int, default=10)
+    sp.add_argument("--seed", type=int, default=0)
+    sp.set_defaults(func=report_species)
+
+    en = subparsers.add_parser("ensemble", help="replicate-steps per second of an ensemble of independent flocks")
+    en.add_argument("--nboids", type=int, default=150)
+    en.add_argument("--replicates", type=int, default=500)
+    en.add_argument("--steps", type=int, default=20)
+    en.add_argument("--seed", type=int, default=0)
+    en.set_defaults(func=report_ensemble)
+
+    di = subparsers.add_parser("differential", help="divergence and speedup of a candidate compared to the reference, "
+                                                    "fails if the divergence exceeds the budget")
+    di.add_argument("--candidate", choices=sorted(differential.candidates), default="vector")
+    di.add_argument("--nboids", type=int, default=150)
+    di.add_argument("--npredators", type=int, default=None, help="default: 1 (0 for the ensemble)")
+    di.add_argument("--steps", type=int, default=100)
+    di.add_argument("--seed", type=int, default=0)
+    di.add_argument("--free-running", action="store_true",
+                    help="don't resync the candidate after every step (only reports the divergence, doesn't fail)")
+    di.add_argument("--budget", nargs="*", default=[], type=budget_item, metavar="METRIC=VALUE",
+                    help=f"override the budget of {', '.join(differential.DivergenceReport.metrics)}")
+    di.set_defaults(func=report_differential)
+
+    se = subparsers.add_parser("server", help="how many sessions the simulation server sustains at its tick rate")
+    se.add_argument("--nboids", type=int, default=150)
+    se.add_argument("--rate", type=int, default=48, help="ticks per second")
+    se.add_argument("--seconds", type=float, default=3, help="length of every load test")
+    se.add_argument("--unwatched", dest="watched", action="store_false",
+                    help="test sessions nobody watches (stepped at a reduced rate)")
+    se.set_defaults(func=report_server)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
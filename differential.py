@@ -0,0 +1,258 @@
+"""Differential testing of the faster simulations against the reference object model (actors.py, obstacles.py).
+
+The reference Simulation and a candidate are started from the same seeded state and stepped side by side. Every step
+the divergence of the positions, velocities, neighbor sets and avoidance decisions is measured, together with the
+time both of them needed. Run it with `python benchmarks.py differential`.
+"""
+import random
+import time
+import numpy as np
+from actors import Actor
+from ensemble import Ensemble
+from obstacles import Circle, Wall
+from simulation import Simulation
+from species import boid_species
+import vector_simulation
+from vector_simulation import VectorSimulation
+
+# The largest allowed divergence in a resynced step against simultaneous_step: positions in px, velocities relative to
+# the maximum speed, neighbors and avoidance as the fraction of boids (actors) with a different neighbor set (threat).
+# The candidates update all the actors at once like simultaneous_step, so they have to agree apart from rounding.
+#
+# Against Simulation.step (sequential), where the boids are updated one after another, a single step of 150 boids
+# diverges by up to 0.73 px, 0.36 of the maximum speed and 18% of the neighbor sets, which is more than leaving out
+# the whole flocking force would change in a step. That comparison (and free-running ones, whose divergence grows
+# chaotically) are only reported and have no budget.
+default_budget = {"position": 0.000001, "velocity": 0.000001, "neighbors": 0.0, "avoidance": 0.0}
+
+
+def reference_scene(window_size=(1080, 720), nboids=150, npredators=1, seed=0):
+    """Creates a seeded reference Simulation with a few obstacles (and predators) in the way of the boids."""
+    np.random.seed(seed)
+    random.seed(seed)
+    sim = Simulation(window_size, nboids)
+    sim.setup()
+    width, height = window_size
+    sim.add_obstacles(Circle((width * 0.3, height * 0.4), 20), Circle((width * 0.6, height * 0.6), 40),
+                      Wall((width * 0.7, height * 0.2), (width * 0.85, height * 0.45)))
+    for _ in range(npredators):
+        sim.add_predator(sim.center, velocity=np.random.uniform(-1, 1, 2), view_angle=np.pi/2)
+    return sim
+
+
+def simultaneous_step(sim, dt):
+    """Steps the reference Simulation like Simulation.step, but all the forces are calculated before any actor moves.
+
+    Simulation.step updates the actors one after another, so later boids already see the new positions and velocities
+    of earlier ones. The array based simulations update all of them at once, which this step does with the methods of
+    the reference (see Boid.update and Predator.update)."""
+    forces = []
+    for actor in sim.actors:
+        if actor in sim.predators:
+            forces.append(actor.calc_pursuit() if actor.update_this_frame else None)
+        else:
+            if actor.update_this_frame:
+                actor.get_neighbors()
+                actor.calc_flocking()
+            forces.append(actor.flocking + actor.calc_evasion())
+
+    for actor, force in zip(sim.actors, forces):
+        if force is not None:
+            actor.forces += force
+        Actor.update(actor, dt)
+        if actor not in sim.predators:
+            actor.change_color()
+        actor.update_this_frame = not actor.update_this_frame
+
+
+class VectorCandidate:
+    """Runs a VectorSimulation next to the reference."""
+
+    name = "VectorSimulation"
+
+    def __init__(self, reference):
+        self.sim, self.order = VectorSimulation.from_simulation(reference)
+        self.sim.obstacles = list(reference.obstacles)
+
+    def sync(self, reference):
+        """Copies the state of the reference actors."""
+        self.sim.pos[:] = [tuple(actor.pos) for actor in self.order]
+        self.sim.v[:] = [tuple(actor.v) for actor in self.order]
+        self.sim.speed[:] = [actor.speed for actor in self.order]
+        self.sim.ahead[:] = [tuple(actor.ahead) for actor in self.order]
+        self.sim.flocking[:] = [tuple(getattr(actor, "flocking", (0.0, 0.0))) for actor in self.order]
+        self.sim.update_this_frame[:] = [actor.update_this_frame for actor in self.order]
+
+    def step(self, dt):
+        self.sim.step(dt)
+
+    def positions(self):
+        return self.sim.pos
+
+    def velocities(self):
+        return self.sim.v
+
+    def neighbors(self, update):
+        """The sets of neighbors of the boids with the given indices."""
+        return neighbor_sets(*self.sim.find_neighbors(update)[:2], update)
+
+    def threats(self):
+        return self.sim.find_threats()
+
+
+class EnsembleCandidate:
+    """Runs an Ensemble with a single replicate next to the reference (which mustn't have predators)."""
+
+    name = "Ensemble"
+
+    def __init__(self, reference):
+        if reference.predators:
+            raise ValueError("an Ensemble can't simulate predators")
+        self.sim = Ensemble(reference.window_size, len(reference.flock), 1, boid_species(**reference.boid_settings))
+        self.sim.add_obstacles(0, *reference.obstacles)
+        self.order = list(reference.flock)
+        self.sync(reference)
+
+    def sync(self, reference):
+        """Copies the state of the reference boids."""
+        self.sim.pos[0] = [tuple(boid.pos) for boid in self.order]
+        self.sim.v[0] = [tuple(boid.v) for boid in self.order]
+        self.sim.speed[0] = [boid.speed for boid in self.order]
+        self.sim.ahead[0] = [tuple(boid.ahead) for boid in self.order]
+        self.sim.flocking[0] = [tuple(boid.flocking) for boid in self.order]
+        self.sim.update_this_frame[0] = [boid.update_this_frame for boid in self.order]
+
+    def step(self, dt):
+        self.sim.step(dt)
+
+    def positions(self):
+        return self.sim.pos[0]
+
+    def velocities(self):
+        return self.sim.v[0]
+
+    def neighbors(self, update):
+        """The sets of neighbors of the boids with the given indices."""
+        return neighbor_sets(*self.sim.find_neighbors(update)[:2], update)
+
+    def threats(self):
+        return self.sim.find_threats()[0]
+
+
+candidates = {"vector": VectorCandidate, "ensemble": EnsembleCandidate}
+
+
+def neighbor_sets(i, j, update):
+    """Turns the pairs (i, j) of boids where j is a neighbor of i into a set of neighbors for every boid in update."""
+    sets = {boid: set() for boid in update}
+    for boid, neighbor in zip(i.tolist(), j.tolist()):
+        sets[boid].add(neighbor)
+    return [sets[boid] for boid in update]
+
+
+class DivergenceReport:
+    """The divergence of every step and the time the reference and the candidate needed."""
+
+    metrics = ("position", "velocity", "neighbors", "avoidance")
+
+    def __init__(self, candidate, budget=None, resync=True, sequential=False, grid=False):
+        self.candidate = candidate  # name of the candidate
+        if budget is None:
+            budget = default_budget if resync and not sequential else {}
+        self.budget = dict(budget)
+        self.resync = resync
+        self.sequential = sequential
+        self.grid = grid
+        self.steps = []  # one dict of metrics per step
+        self.reference_time = 0.0  # wall-clock time in s
+        self.candidate_time = 0.0
+
+    def worst(self, metric):
+        return max((step[metric] for step in self.steps), default=0.0)
+
+    def speedup(self):
+        return self.reference_time / self.candidate_time if self.candidate_time > 0.0 else float("inf")
+
+    def exceeded(self):
+        """Returns the metrics whose divergence exceeded the budget in any step, with the worst divergence."""
+        return {metric: self.worst(metric) for metric in self.metrics
+                if metric in self.budget and self.worst(metric) > self.budget[metric]}
+
+    def passed(self):
+        return not self.exceeded()
+
+    def summary(self):
+        reference = "Simulation.step" if self.sequential else "simultaneous_step"
+        mode = ("resynced every step" if self.resync else "free-running") + \
+            (", grid neighbor search" if self.grid else "") + ("" if self.budget else ", only reported")
+        lines = [f"{self.candidate} vs. reference ({reference}), {len(self.steps)} steps ({mode})"]
+        for metric in self.metrics:
+            mean = np.mean([step[metric] for step in self.steps]) if self.steps else 0.0
+            budget = self.budget.get(metric)
+            status = "" if budget is None else ("ok" if self.worst(metric) <= budget else "EXCEEDED")
+            lines.append(f"  {metric:10} worst {self.worst(metric):10.3g}   mean {mean:10.3g}   "
+                         f"budget {budget if budget is not None else '-':>8}   {status}".rstrip())
+        lines.append(f"  speedup    x{self.speedup():.1f} "
+                     f"({self.reference_time:.2f} s vs. {self.candidate_time:.2f} s)")
+        return "\n".join(lines)
+
+
+def compare(reference, candidate_class=VectorCandidate, steps=100, dt=20.0, resync=True, sequential=False, grid=False,
+            budget=None):
+    """Steps the reference Simulation and a candidate (see candidates) side by side and measures their divergence.
+
+    With resync, the candidate is set to the state of the reference after every step, so only the divergence of a
+    single step is measured. Otherwise the divergence adds up (and eventually grows, as flocking is chaotic).
+    The reference is stepped with simultaneous_step, which leaves only the divergence of the candidate's own
+    calculations. With sequential, it is stepped with Simulation.step instead, so the divergence also contains the
+    effect of updating the actors one after another. With grid, the candidate always uses the grid neighbor search
+    (which small flocks otherwise skip, see vector_simulation.brute_force_pairs).
+
+    Without a budget, only resynced steps against simultaneous_step are checked against default_budget."""
+    brute_force_pairs = vector_simulation.brute_force_pairs
+    if grid:
+        vector_simulation.brute_force_pairs = 0
+    try:
+        return _compare(reference, candidate_class, steps, dt, resync, sequential, grid, budget)
+    finally:
+        vector_simulation.brute_force_pairs = brute_force_pairs
+
+
+def _compare(reference, candidate_class, steps, dt, resync, sequential, grid, budget):
+    candidate = candidate_class(reference)
+    report = DivergenceReport(candidate.name, budget, resync, sequential, grid)
+    reference_step = reference.step if sequential else lambda dt: simultaneous_step(reference, dt)
+    boid_index = {id(boid): k for k, boid in enumerate(reference.flock)}
+    obstacle_index = {id(obstacle): k for k, obstacle in enumerate(reference.obstacles)}
+    max_speed = np.array([actor.max_speed for actor in candidate.order])
+
+    for _ in range(steps):
+        # The threats only depend on the actor itself, so they can be found before the step. The neighbors of the
+        # reference are found during the step and only by the boids that update them this step.
+        reference_threats = [obstacle_index.get(id(actor.find_threat()[0]), -1) for actor in candidate.order]
+        update = [k for k, boid in enumerate(reference.flock) if boid.update_this_frame]
+        candidate_threats = candidate.threats()
+        candidate_neighbors = candidate.neighbors(np.array(update, dtype=np.int64))
+
+        start = time.perf_counter()
+        reference_step(dt)
+        report.reference_time += time.perf_counter() - start
+        start = time.perf_counter()
+        candidate.step(dt)
+        report.candidate_time += time.perf_counter() - start
+
+        reference_neighbors = [{boid_index[id(n)] for n in reference.flock[k].neighbors} for k in update]
+        positions = np.array([tuple(actor.pos) for actor in candidate.order])
+        velocities = np.array([tuple(actor.v) for actor in candidate.order])
+
+        report.steps.append({
+            "position": np.max(np.hypot(*(candidate.positions() - positions).T), initial=0.0),
+            "velocity": np.max(np.hypot(*(candidate.velocities() - velocities).T) / max_speed, initial=0.0),
+            "neighbors": np.mean([a != b for a, b in zip(reference_neighbors, candidate_neighbors)]) if update else 0.0,
+            "avoidance": np.mean(np.array(reference_threats) != candidate_threats) if reference_threats else 0.0,
+        })
+
+        if resync:
+            candidate.sync(reference)
+
+    return report
@@ -0,0 +1,145 @@
+import numpy as np
+import actors
+from obstacles import boundary_walls
+from species import boid_species
+from timing import FixedStepper
+from vector_simulation import (VectorSimulation, calc_flocking, find_threats, in_fov, integrate, neighbor_pairs,
+                               normalize, obstacle_arrays)
+from vectors2d import Vector
+
+
+class Ensemble:
+    """Many independent simulations of a flock (replicates), stacked along a leading axis and stepped all at once.
+
+    Every replicate has its own seed and its own obstacles, all of them share the boid species and the number of
+    boids. There are no predators. The state arrays have the shape (replicates, boids, ...)."""
+
+    def __init__(self, window_size=(1, 1), nboids=150, nreplicates=100, boid=None):
+        self.window_size = Vector(window_size[0], window_size[1])
+        self.center = Vector(window_size[0]/2, window_size[1]/2)
+        self.nboids = nboids
+        self.nreplicates = nreplicates
+        self.boid = boid_species() if boid is None else boid
+        self.stepper = FixedStepper(fixed_dt=20.0)  # fixed step size in ms, see advance()
+        self.seeds = None
+
+        self.obstacles = [[] for _ in range(nreplicates)]  # the obstacles of every replicate
+        self.packed_obstacles = None  # the obstacles as arrays (see obstacle_arrays), None after they changed
+
+        shape = (nreplicates, nboids)
+        self.pos = np.zeros(shape + (2,))  # position
+        self.v = np.zeros(shape + (2,))  # velocity
+        self.speed = np.zeros(shape)
+        self.ahead = np.zeros(shape + (2,))  # look ahead vector to avoid collision
+        self.flocking = np.zeros(shape + (2,))  # the flocking force, only updated every second frame
+        self.update_this_frame = np.zeros(shape, dtype=bool)
+
+    def setup(self, seeds=None):
+        """Creates the walls and boids of every replicate. The random positions and velocities of replicate r are drawn
+        like in Simulation.setup after np.random.seed(seeds[r])."""
+        self.seeds = list(range(self.nreplicates)) if seeds is None else list(seeds)
+
+        for r, seed in enumerate(self.seeds):
+            self.add_obstacles(r, *boundary_walls(self.window_size))
+
+            random = np.random.RandomState(seed)
+            x_vals = random.uniform(0, self.window_size.x, self.nboids)
+            y_vals = random.uniform(0, self.window_size.y, self.nboids)
+            self.pos[r] = np.column_stack((x_vals, y_vals))
+            self.v[r] = normalize(random.uniform(-1, 1, (self.nboids, 2))) * self.boid.max_speed
+            self.update_this_frame[r] = random.randint(0, 2, self.nboids).astype(bool)
+
+        self.speed[:] = self.boid.max_speed
+        self.ahead = self.v * actors.look_ahead_time
+        self.flocking[:] = 0.0
+
+    def add_obstacles(self, replicate, *args):
+        for obstacle in args:
+            self.obstacles[replicate].append(obstacle)
+        self.packed_obstacles = None
+
+    def delete_obstacles(self, replicate, *args):
+        for obstacle in args:
+            self.obstacles[replicate].remove(obstacle)
+        self.packed_obstacles = None
+
+    def clear_obstacles(self, replicate=None):
+        """Deletes all obstacles except the four walls, of one replicate or of all of them."""
+        for r in range(self.nreplicates) if replicate is None else [replicate]:
+            del self.obstacles[r][4:]
+        self.packed_obstacles = None
+
+    def pack_obstacles(self):
+        """Packs the obstacles of all the replicates into arrays with a leading replicate axis."""
+        size = max(len(obstacles) for obstacles in self.obstacles)
+        packed = [obstacle_arrays(obstacles, size) for obstacles in self.obstacles]
+        return tuple(np.stack(arrays) for arrays in zip(*packed))
+
+    def step(self, dt):
+        # only update the flocking force every second frame (of every boid)
+        update = np.flatnonzero(self.update_this_frame)
+        if len(update):
+            flocking = self.flocking.reshape(-1, 2)
+            flocking[update] = self.calc_flocking(update)
+
+        if self.packed_obstacles is None:
+            self.packed_obstacles = self.pack_obstacles()
+        avoidance = find_threats(self.pos, self.ahead, *self.packed_obstacles)[1]
+        avoidance *= self.boid.avoidance_strength
+
+        self.pos, self.v, self.speed = integrate(self.pos, self.v, self.flocking + avoidance, self.boid.mass,
+                                                 self.boid.max_speed, self.window_size, dt)
+        self.ahead = self.v * actors.look_ahead_time
+        self.update_this_frame = ~self.update_this_frame
+
+    def calc_flocking(self, update):
+        """Calculates the flocking forces of the boids with the given flat indices (replicate * nboids + boid)."""
+        boid = self.boid
+        i, j, diff = self.find_neighbors(update)
+        flocking = calc_flocking(normalize(self.v.reshape(-1, 2)), i, j, diff, boid.separation_radius,
+                                 boid.separation_strength, boid.alignment_strength, boid.cohesion_strength)
+        return flocking[update]
+
+    def find_neighbors(self, update):
+        """Finds the neighbors of the boids with the given flat indices. Returns the pairs of flat indices (i, j) where
+        j is a neighbor of i and the vectors pointing from i to j.
+
+        For the neighbor search, the replicates are laid out next to each other (in x direction) and searched all at
+        once. Pairs of boids from different replicates are dropped, in case a boid strays far out of its window."""
+        boid = self.boid
+        stride = self.window_size.x + 3 * boid.view_distance
+        offsets = np.column_stack((np.arange(self.nreplicates) * stride, np.zeros(self.nreplicates)))
+        pos = (self.pos + offsets[:, None, :]).reshape(-1, 2)
+        heading = normalize(self.v.reshape(-1, 2))
+        replicate = np.repeat(np.arange(self.nreplicates), self.nboids)
+
+        i, j, diff = neighbor_pairs(pos, update, boid.view_distance, (self.nreplicates * stride, self.window_size.y))
+        cos_half_view = np.cos(boid.view_angle / 2)
+        neighbor = (replicate[i] == replicate[j]) & in_fov(heading[i], normalize(diff), cos_half_view)
+        return i[neighbor], j[neighbor], diff[neighbor]
+
+    def find_threats(self):
+        """Returns the index of the closest obstacle in the way of every boid (-1 if there is none)."""
+        if self.packed_obstacles is None:
+            self.packed_obstacles = self.pack_obstacles()
+        return find_threats(self.pos, self.ahead, *self.packed_obstacles)[0]
+
+    def advance(self, elapsed):
+        """Advances all the replicates by `elapsed` ms of wall-clock time (sped up by the time warp) in fixed steps."""
+        return self.stepper.advance(self.step, elapsed)
+
+    def polarization(self):
+        """The length of the average heading of the boids of every replicate: 1 if they all fly in the same
+        direction, close to 0 if they fly in random directions."""
+        return np.hypot(*normalize(self.v).mean(axis=1).T)
+
+    def replicate(self, r):
+        """Returns a copy of replicate r as a VectorSimulation, e.g. to look at it or to continue it on its own."""
+        sim = VectorSimulation(self.window_size, self.nboids, self.boid)
+        sim.add_obstacles(*self.obstacles[r])
+        sim.add_actors(self.boid, self.pos[r], self.v[r], self.update_this_frame[r].copy())
+        sim.v[:] = self.v[r]
+        sim.speed[:] = self.speed[r]
+        sim.ahead[:] = self.ahead[r]
+        sim.flocking[:] = self.flocking[r]
+        return sim
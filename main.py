@@ -16,6 +16,7 @@ RED = (255, 0, 0)
 GREEN = (0, 255, 0)
 BLUE = (0, 0, 255)
 BACKGROUND = (42, 57, 144)
+TIME_WARPS = (1, 2, 5, 10, 100)  # fast-forward speeds, the F key cycles through the ones the simulation can reach
 
 
 def setup_sliders(display):
@@ -149,6 +150,27 @@ def draw_obstacles(sim, display):
             pg.draw.circle(display, (0, 0, 255), obstacle.pos, obstacle.rad)
 
 
+def reachable_time_warps(sim, fps):
+    """the time warps whose substeps fit into the stepping budget of a frame (at the measured speed of a step, see
+    Simulation.reachable)"""
+    return [warp for warp in TIME_WARPS if sim.reachable(warp, 1000 / fps)]
+
+
+def next_time_warp(sim, fps):
+    """the next larger reachable time warp, back to the first one after the largest"""
+    warps = reachable_time_warps(sim, fps)
+    larger = [warp for warp in warps if warp > sim.stepper.time_warp]
+    return larger[0] if larger else warps[0]
+
+
+def update_caption(sim, fps):
+    """shows the current (and largest reachable) time warp and the simulated seconds per wall-clock second in the
+    window title"""
+    pg.display.set_caption(f"Boids - time warp x{sim.stepper.time_warp:g} "
+                           f"(max x{reachable_time_warps(sim, fps)[-1]:g}) - "
+                           f"{sim.stepper.throughput():.1f} simulated s per s")
+
+
 def main(sim, fps, window_size):
     """Main function"""
     pg.init()
@@ -196,11 +218,16 @@ def main(sim, fps, window_size):
                     sim.add_obstacles(wall)
                     wall_start = None
 
+            # cycle through the fast-forward speeds
+            elif event.type == pg.KEYDOWN and event.key == pg.K_f:
+                sim.set_time_warp(next_time_warp(sim, fps))
+
         # preparing the next empty frame
         display.fill(WHITE)
         dt = clock.tick(fps)
         slider_update(slider_settings)  # fetching parameters (live!)
-        sim.step(dt)  # applying parameters instantly (live!) simulating movements in the next frame
+        sim.advance(dt)  # applying parameters instantly (live!) simulating movements in the next frame
+        update_caption(sim, fps)
 
         # drawing what is to be drawn
         draw_actors(sim, display)
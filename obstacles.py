@@ -68,3 +68,11 @@ class Wall(Obstacle):
 
         return False
 
+
+def boundary_walls(window_size):
+    """Creates the four walls around the edges of the window."""
+    top_wall = Wall((0, 0), (window_size.x, 0))
+    right_wall = Wall((window_size.x, 0), (window_size.x, window_size.y))
+    bottom_wall = Wall((window_size.x, window_size.x), (0, window_size.y))
+    left_wall = Wall((0, window_size.y), (0, 0))
+    return top_wall, right_wall, bottom_wall, left_wall
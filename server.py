@@ -0,0 +1,353 @@
+"""Asyncio server hosting many interactive simulations (sessions) at once.
+
+Start it with `python server.py --port 8765`. Clients connect over TCP and send one JSON command per line, the server
+answers every command with one JSON line ({"ok": true, ...} or {"ok": false, "error": ...}):
+
+    {"cmd": "create", "nboids": 150, "seed": 1}                   -> {"ok": true, "session": 1}
+    {"cmd": "close", "session": 1}
+    {"cmd": "add_obstacle", "session": 1, "circle": [x, y, radius]}
+    {"cmd": "add_obstacle", "session": 1, "wall": [x1, y1, x2, y2]}
+    {"cmd": "clear_obstacles", "session": 1}
+    {"cmd": "add_predator", "session": 1, "position": [x, y], "velocity": [vx, vy]}   (both optional)
+    {"cmd": "set", "session": 1, "species": "boid", "parameters": {"separation_strength": 6.0}}
+    {"cmd": "reset", "session": 1}
+    {"cmd": "state", "session": 1}                                -> {"ok": true, "frame": {...}}
+    {"cmd": "watch", "session": 1} / {"cmd": "unwatch", "session": 1}
+    {"cmd": "stats"}
+
+While a client watches a session, it is sent a frame ({"frame": {...}}) after every step of it. Every tick (48 per
+second by default), the sessions are stepped in turns until the time budget of the tick is used up. Every step is a
+fixed step of the simulation (20 ms simulated time), so a watched session runs in real time at any tick rate. Sessions
+that nobody watches are only advanced every few ticks, so they run in slow motion until somebody watches them again.
+A session whose step fails is closed, its watchers are sent {"closed": session, "error": ...}.
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import deque
+import numpy as np
+from obstacles import Circle, Wall
+from species import Species, predator_species
+from vector_simulation import VectorSimulation
+
+# the allowed ranges of the species parameters, rule strengths not listed here may be between 0 and max_strength
+parameter_ranges = {"max_speed": (0.001, 1.0), "view_distance": (1.0, 500.0), "view_angle": (0.0, 2 * math.pi),
+                    "mass": (1.0, 1e6), "separation_radius": (0.0, 500.0)}
+max_strength = 1000.0
+
+
+class Session:
+    """One simulation with its own obstacles, predators and parameters, and the clients watching it."""
+
+    def __init__(self, session_id, window_size=(1080, 720), nboids=150, seed=None):
+        self.id = session_id
+        self.sim = VectorSimulation(window_size, nboids, random=np.random.RandomState(seed))  # its own random numbers
+        self.sim.setup()
+        self.predator = predator_species(view_angle=np.pi/2)  # like the predator button in main.py
+        self.dt = self.sim.stepper.fixed_dt  # simulated ms per step
+
+        self.watchers = set()  # the stream writers of the clients watching this session
+        self.accumulator = 0.0  # simulated time in ms that is still waiting to be scheduled as steps
+        self.due = 0  # steps waiting to be done
+        self.steps = 0  # steps done
+        self.dropped = 0  # steps skipped because the server couldn't keep up
+
+    @property
+    def watched(self):
+        return bool(self.watchers)
+
+    def schedule(self, elapsed, max_backlog):
+        """Schedules the fixed steps for `elapsed` ms of simulated time. Steps that would make the session fall more
+        than max_backlog times `elapsed` behind are dropped."""
+        self.accumulator += elapsed
+        steps = int(self.accumulator // self.dt)
+        self.accumulator -= steps * self.dt
+        limit = math.ceil(max_backlog * elapsed / self.dt)
+        scheduled = max(0, min(steps, limit - self.due))
+        self.dropped += steps - scheduled
+        self.due += scheduled
+
+    def step(self):
+        self.sim.step(self.dt)
+        self.due -= 1
+        self.steps += 1
+
+    def frame(self):
+        """The state of the simulation to draw it: positions (in px), headings (in degrees) and colors of the actors,
+        boids before predators. Everything is rounded to integers, which are a lot faster to send as JSON."""
+        heading = np.degrees(np.arctan2(self.sim.v[:, 1], self.sim.v[:, 0]))
+        return {"session": self.id, "step": self.steps, "n_boids": self.sim.n_boids,
+                "pos": np.rint(self.sim.pos).astype(int).tolist(), "heading": np.rint(heading).astype(int).tolist(),
+                "color": np.rint(self.sim.colors()).astype(int).tolist()}
+
+    def add_obstacle(self, circle=None, wall=None):
+        if circle is not None:
+            x, y, radius = self.coordinates(circle, 3, "circle")
+            if not 0 < radius <= max(self.sim.window_size):
+                raise ValueError("the radius of a circle has to be between 0 and the size of the window")
+            self.sim.add_obstacles(Circle((x, y), radius))
+        elif wall is not None:
+            x1, y1, x2, y2 = self.coordinates(wall, 4, "wall")
+            if (x1, y1) == (x2, y2):
+                raise ValueError("a wall needs two different points")
+            self.sim.add_obstacles(Wall((x1, y1), (x2, y2)))
+        else:
+            raise ValueError("add_obstacle needs a circle or a wall")
+
+    def add_predator(self, position=None, velocity=None):
+        position = self.sim.center if position is None else self.coordinates(position, 2, "position")
+        velocity = self.sim.random.uniform(-1, 1, 2) if velocity is None else self.coordinates(velocity, 2, "velocity")
+        self.sim.add_predator(position, velocity, self.predator)
+
+    def coordinates(self, values, count, name):
+        """Checks that values is a list of `count` finite numbers not further than the size of the window outside of
+        the window (every second one is an x coordinate), and returns them as floats."""
+        if not isinstance(values, list) or len(values) != count or not all(_is_number(value) for value in values):
+            raise ValueError(f"{name} has to be a list of {count} finite numbers")
+        for k, value in enumerate(values):
+            size = self.sim.window_size[k % 2]
+            if not -size <= value <= 2 * size:
+                raise ValueError(f"{name} is too far outside of the window")
+        return [float(value) for value in values]
+
+    def set_parameters(self, species, parameters):
+        """Changes the parameters of the boid or predator species of this session (like the sliders in main.py).
+        All the parameters are checked before any of them is changed."""
+        target = {"boid": self.sim.boid, "predator": self.predator}.get(species)
+        if target is None:
+            raise ValueError(f"unknown species {species!r}, use 'boid' or 'predator'")
+        if not isinstance(parameters, dict):
+            raise ValueError("parameters have to be a JSON object")
+        for name, value in parameters.items():
+            if name not in Species.parameters:
+                raise ValueError(f"unknown parameter {name!r}")
+            if not _is_number(value):
+                raise ValueError(f"parameter {name!r} has to be a finite number")
+            low, high = parameter_ranges.get(name, (0.0, max_strength))
+            if not low <= value <= high:
+                raise ValueError(f"parameter {name!r} has to be between {low:g} and {high:g}")
+
+        for name, value in parameters.items():
+            setattr(target, name, float(value))
+        self.sim.refresh_parameters()
+
+    def reset(self):
+        self.sim.reset()
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+class SimulationServer:
+    """Hosts the sessions and steps them fairly within the time budget of every tick."""
+
+    def __init__(self, rate=48, budget=0.8, idle_every=12, max_backlog=2, window_size=(1080, 720), max_boids=2000):
+        self.rate = rate  # ticks per second
+        self.budget = budget  # fraction of a tick that may be spent stepping sessions
+        self.idle_every = idle_every  # sessions nobody watches are only advanced (by one tick) every idle_every ticks
+        self.max_backlog = max_backlog  # most ticks a session can fall behind, the rest of the steps are dropped
+        self.window_size = window_size
+        self.max_boids = max_boids  # most boids a session can be created with
+        self.sessions = {}
+        self.order = deque()  # round robin order of the sessions, the next one to step first
+        self.next_id = 1
+        self.ticks = 0
+        self.late_ticks = 0  # ticks that ended with steps left to do
+
+    def create_session(self, nboids=150, seed=None):
+        if isinstance(nboids, bool) or not isinstance(nboids, int) or not 0 <= nboids <= self.max_boids:
+            raise ValueError(f"nboids has to be a whole number between 0 and {self.max_boids}")
+        session = Session(self.next_id, self.window_size, nboids, seed)
+        self.sessions[session.id] = session
+        self.order.append(session)
+        self.next_id += 1
+        return session
+
+    def close_session(self, session):
+        del self.sessions[session.id]
+        self.order.remove(session)
+
+    def fail_session(self, session, error):
+        """Closes a session whose step failed and tells its watchers, so it can't stop the other sessions."""
+        message = encode({"closed": session.id, "error": f"{type(error).__name__}: {error}"})
+        for writer in session.watchers:
+            send(writer, message)
+        self.close_session(session)
+
+    def tick(self):
+        """Schedules this tick's steps and steps the sessions in turns (one step each, round robin) until they are done
+        or the time budget of the tick is used up. Returns the sessions that were stepped."""
+        self.ticks += 1
+        for session in self.sessions.values():
+            # unwatched sessions are due on different ticks (by id), so they don't all step in the same tick
+            if session.watched or (self.ticks + session.id) % self.idle_every == 0:
+                session.schedule(1000 / self.rate, self.max_backlog)
+
+        deadline = time.perf_counter() + self.budget / self.rate
+        stepped = set()
+        idle = 0  # sessions in a row that had nothing to do
+        while idle < len(self.order) and time.perf_counter() < deadline:
+            session = self.order[0]
+            self.order.rotate(-1)
+            if session.due > 0:
+                try:
+                    session.step()
+                except Exception as error:
+                    self.fail_session(session, error)
+                    stepped.discard(session)
+                    continue
+                stepped.add(session)
+                idle = 0
+            else:
+                idle += 1
+
+        if any(session.due > 0 for session in self.sessions.values()):
+            self.late_ticks += 1
+        return stepped
+
+    def send_frames(self, sessions):
+        for session in sessions:
+            if session.watched:
+                message = encode({"frame": session.frame()})
+                for writer in session.watchers:
+                    send(writer, message)
+
+    async def run(self):
+        """Ticks at the tick rate forever."""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            self.send_frames(self.tick())
+            next_tick += 1 / self.rate
+            delay = next_tick - loop.time()
+            if delay < 0:  # fell behind, don't try to catch up
+                next_tick = loop.time()
+            await asyncio.sleep(max(delay, 0.0))
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.run())
+
+    async def handle_client(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    reply = self.execute(json.loads(line), writer)
+                except Exception as error:  # a bad command only fails itself
+                    reply = {"ok": False, "error": str(error)}
+                send(writer, encode(reply))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for session in self.sessions.values():
+                session.watchers.discard(writer)
+            writer.close()
+
+    def execute(self, command, writer):
+        """Executes a command of a client and returns the reply."""
+        if not isinstance(command, dict):
+            raise ValueError("a command has to be a JSON object")
+        cmd = command.get("cmd")
+        if cmd == "create":
+            session = self.create_session(command.get("nboids", 150), command.get("seed"))
+            return {"ok": True, "session": session.id}
+        if cmd == "stats":
+            return {"ok": True, "stats": self.stats()}
+
+        session = self.sessions.get(command.get("session"))
+        if session is None:
+            raise ValueError(f"unknown session {command.get('session')!r}")
+
+        if cmd == "close":
+            self.close_session(session)
+        elif cmd == "add_obstacle":
+            session.add_obstacle(command.get("circle"), command.get("wall"))
+        elif cmd == "clear_obstacles":
+            session.sim.clear_obstacles()
+        elif cmd == "add_predator":
+            session.add_predator(command.get("position"), command.get("velocity"))
+        elif cmd == "set":
+            session.set_parameters(command.get("species", "boid"), command["parameters"])
+        elif cmd == "reset":
+            session.reset()
+        elif cmd == "state":
+            return {"ok": True, "frame": session.frame()}
+        elif cmd == "watch":
+            session.watchers.add(writer)
+        elif cmd == "unwatch":
+            session.watchers.discard(writer)
+        else:
+            raise ValueError(f"unknown command {cmd!r}")
+        return {"ok": True}
+
+    def stats(self):
+        return {"ticks": self.ticks, "late_ticks": self.late_ticks,
+                "sessions": {session.id: {"watched": session.watched, "steps": session.steps,
+                                          "dropped": session.dropped} for session in self.sessions.values()}}
+
+
+def encode(message):
+    return (json.dumps(message) + "\n").encode()
+
+
+def send(writer, message, max_buffer=1 << 20):
+    """Writes a message unless the client is so slow that more than max_buffer bytes are still waiting to be sent."""
+    if writer.transport.get_write_buffer_size() <= max_buffer:
+        writer.write(message)
+
+
+class _NullWriter:
+    """Stands in for the stream writer of a watching client in load_test, throws away everything written to it."""
+
+    def __init__(self):
+        self.transport = self
+        self.written = 0
+
+    def get_write_buffer_size(self):
+        return 0
+
+    def write(self, data):
+        self.written += len(data)
+
+
+async def _run_for(server, seconds):
+    """Runs the server for the given time and returns the time it actually ran."""
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(server.run(), seconds)
+    except asyncio.TimeoutError:
+        pass
+    return time.perf_counter() - start
+
+
+def load_test(nsessions, seconds=3.0, nboids=150, rate=48, watched=True):
+    """Runs a server with nsessions sessions (watched by clients that discard the frames, so the frames are still
+    made) in real time. Returns the steps per second of the slowest and the fastest session and the fraction of ticks
+    that ended with steps left to do. A watched session has to do 1000 / fixed_dt steps per second (50 by default)."""
+    server = SimulationServer(rate=rate)
+    for seed in range(nsessions):
+        session = server.create_session(nboids, seed)
+        if watched:
+            session.watchers.add(_NullWriter())
+
+    elapsed = asyncio.run(_run_for(server, seconds))
+    steps = [session.steps for session in server.sessions.values()]
+    return min(steps) / elapsed, max(steps) / elapsed, server.late_ticks / max(server.ticks, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=int, default=48, help="ticks per second")
+    args = parser.parse_args()
+    asyncio.run(SimulationServer(rate=args.rate).serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
+import time
 import numpy as np
+import actors
 from actors import Boid, Predator
-from obstacles import Wall
+from obstacles import boundary_walls
+from species import Species
 from vectors2d import Vector
+from timing import FixedStepper
+from vector_simulation import VectorSimulation
 
 
 class Simulation:
@@ -15,14 +20,13 @@ class Simulation:
         self.nboids = nboids
         self.boid_settings = {"max_speed": 0.1, "view_distance": 50, "view_angle": np.pi*1.5, "mass": 5000,
                               "color": (255, 255, 0)}
+        self.stepper = FixedStepper(fixed_dt=20.0)  # fixed step size in ms, see advance()
+        self.fast_forward = None  # (VectorSimulation, actors in its order, actors) while fast-forwarding
+        self.fast_step_time = None  # (number of actors, wall-clock ms per step of a VectorSimulation of them)
 
     def setup(self):
         # Create four walls around the edges and add them to the obstacles
-        top_wall = Wall((0, 0), (self.window_size.x, 0))
-        right_wall = Wall((self.window_size.x, 0), (self.window_size.x, self.window_size.y))
-        bottom_wall = Wall((self.window_size.x, self.window_size.x), (0, self.window_size.y))
-        left_wall = Wall((0, self.window_size.y), (0, 0))
-        self.add_obstacles(top_wall, right_wall, bottom_wall, left_wall)
+        self.add_obstacles(*boundary_walls(self.window_size))
 
         # Create random positions and velocities
         x_vals = np.random.uniform(0, self.window_size.x, self.nboids)
@@ -76,6 +80,57 @@ class Simulation:
         for actor in self.actors:
             actor.update(dt)
 
+    def advance(self, elapsed):
+        """Advances the simulation by `elapsed` ms of wall-clock time (sped up by the time warp) in fixed steps.
+
+        While fast-forwarding (time warp above 1), the steps are done by a VectorSimulation in the state of the actors,
+        which is copied back to them after every frame. It updates all the actors at once instead of one after another
+        (see differential.py), but is fast enough for a time warp of 10 and more."""
+        if self.stepper.time_warp <= 1:
+            self.fast_forward = None
+            return self.stepper.advance(self.step, elapsed)
+
+        fast_sim, order = self.fast_forward_sim()
+        substeps = self.stepper.advance(fast_sim.step, elapsed)
+        fast_sim.copy_to(order)
+        return substeps
+
+    def fast_forward_sim(self):
+        """Returns the VectorSimulation doing the steps while fast-forwarding and the actors in its order. It is created
+        again after actors were added or the simulation was reset, and picks up the current rule strengths."""
+        if self.fast_forward is None or self.fast_forward[2] != tuple(self.actors) or \
+                self.fast_forward[0].obstacles is not self.obstacles:
+            fast_sim, order = VectorSimulation.from_simulation(self)
+            self.fast_forward = (fast_sim, order, tuple(self.actors))
+
+        fast_sim, order, _ = self.fast_forward
+        for species in fast_sim.species:
+            for name in Species.rules:
+                setattr(species, name, float(getattr(actors, name)))
+        fast_sim.refresh_parameters()
+        return fast_sim, order
+
+    def set_time_warp(self, time_warp):
+        if (time_warp > 1) != (self.stepper.time_warp > 1):
+            self.stepper.step_time = None  # the other simulation steps from now on, its step time isn't known yet
+        self.stepper.set_time_warp(time_warp)
+
+    def reachable(self, time_warp, frame_time):
+        """Returns whether the steps of a frame of `frame_time` wall-clock ms at the given time warp fit into the frame
+        budget of the stepper. Time warps above 1 are stepped by a VectorSimulation, its step time is measured on a
+        copy of the actors (again after their number changed)."""
+        if time_warp <= 1:
+            return True
+        if self.fast_step_time is None or self.fast_step_time[0] != len(self.actors):
+            fast_sim, _ = VectorSimulation.from_simulation(self)
+            fast_sim.obstacles = list(self.obstacles)
+            fast_sim.step(self.stepper.fixed_dt)  # warm up
+            start = time.perf_counter()
+            for _ in range(5):
+                fast_sim.step(self.stepper.fixed_dt)
+            self.fast_step_time = (len(self.actors), (time.perf_counter() - start) * 1000 / 5)
+        return self.stepper.reachable(time_warp, frame_time, self.fast_step_time[1])
+
     def reset(self):
         self.actors = []
         self.flock = []
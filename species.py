@@ -0,0 +1,55 @@
+import numpy as np
+import actors
+
+
+class Species:
+    """The parameters shared by all actors of one species.
+
+    Boid species flock with their own kind and evade all predators, predator species pursue boids of any species."""
+
+    # numeric parameters, stored per actor in the parameter tables of the VectorSimulation
+    parameters = ("max_speed", "view_distance", "view_angle", "mass", "separation_strength", "separation_radius",
+                  "alignment_strength", "cohesion_strength", "avoidance_strength", "evasion_strength",
+                  "pursuit_strength")
+    # the rule strengths, which default to the (slider controlled) globals of the same name in actors.py
+    rules = ("separation_strength", "separation_radius", "alignment_strength", "cohesion_strength",
+             "avoidance_strength", "evasion_strength", "pursuit_strength")
+
+    def __init__(self, name, predator=False, max_speed=0.1, view_distance=50, view_angle=np.pi*1.5, mass=5000,
+                 color=(255, 255, 0), separation_strength=None, separation_radius=None, alignment_strength=None,
+                 cohesion_strength=None, avoidance_strength=None, evasion_strength=None, pursuit_strength=None):
+        self.name = name
+        self.predator = predator  # predators pursue boids, everything else is a boid
+        self.max_speed = float(max_speed)
+        self.view_distance = float(view_distance)
+        self.view_angle = float(view_angle)  # in radians
+        self.mass = float(mass)
+        self.color = color
+
+        # rule strengths default to the current values of the (slider controlled) globals in actors.py
+        self.separation_strength = _default(separation_strength, actors.separation_strength)
+        self.separation_radius = _default(separation_radius, actors.separation_radius)
+        self.alignment_strength = _default(alignment_strength, actors.alignment_strength)
+        self.cohesion_strength = _default(cohesion_strength, actors.cohesion_strength)
+        self.avoidance_strength = _default(avoidance_strength, actors.avoidance_strength)
+        self.evasion_strength = _default(evasion_strength, actors.evasion_strength)
+        self.pursuit_strength = _default(pursuit_strength, actors.pursuit_strength)
+
+    def __repr__(self):
+        return f"Species({self.name!r}, predator={self.predator})"
+
+
+def _default(value, default):
+    return float(default if value is None else value)
+
+
+def boid_species(name="boid", **kwargs):
+    """The species used by Simulation.add_n_boids (see Simulation.boid_settings)."""
+    return Species(name, **kwargs)
+
+
+def predator_species(name="predator", **kwargs):
+    """The species used by Simulation.add_predator with its default arguments."""
+    settings = {"max_speed": 0.1, "view_distance": 200, "view_angle": np.pi, "mass": 5000, "color": (255, 0, 0)}
+    settings.update(kwargs)
+    return Species(name, predator=True, **settings)
@@ -0,0 +1,87 @@
+import time
+
+
+class FixedStepper:
+    """Advances a simulation in fixed time steps, independent of how long a frame took.
+
+    The elapsed wall-clock time is sped up by the time warp and added to an accumulator. The simulation is then stepped
+    with the same fixed dt until the accumulator is used up, so the integration behaves the same at any time warp.
+    Stepping stops once the wall-clock budget of the frame is used up, so a slow frame can't snowball.
+    """
+
+    def __init__(self, fixed_dt=20.0, time_warp=1.0, max_substeps=200, frame_budget=12.0):
+        self.fixed_dt = float(fixed_dt)  # simulated time per substep in ms
+        self.time_warp = float(time_warp)  # simulated time per wall-clock time
+        self.max_substeps = max_substeps  # upper limit of substeps per advance
+        self.frame_budget = float(frame_budget)  # wall-clock ms per advance that may be spent stepping
+        self.step_time = None  # average wall-clock ms per substep, measured while stepping
+        self.accumulator = 0.0  # simulated time in ms that is still waiting to be stepped
+        self.sim_time = 0.0  # simulated time in ms since the last reset of the stats
+        self.dropped_time = 0.0  # simulated time in ms that was skipped because the stepping couldn't keep up
+        self.busy_time = 0.0  # wall-clock time in s spent stepping since the last reset of the stats
+        self.start_time = time.perf_counter()
+
+    def set_time_warp(self, time_warp):
+        self.time_warp = float(time_warp)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.sim_time = 0.0
+        self.dropped_time = 0.0
+        self.busy_time = 0.0
+        self.start_time = time.perf_counter()
+
+    def advance(self, step, elapsed):
+        """Calls step(fixed_dt) for `elapsed` ms of wall-clock time sped up by the time warp.
+        At least one substep is taken if one is due, the others only if they still fit into the frame budget.
+        Returns the number of substeps that were taken."""
+        self.accumulator += elapsed * self.time_warp
+        due = min(int(self.accumulator // self.fixed_dt), self.max_substeps)
+
+        start = time.perf_counter()
+        # the last substep has to start early enough to end within the budget
+        deadline = start + (self.frame_budget - (self.step_time or 0.0)) / 1000
+        substeps = 0
+        while substeps < due and (substeps == 0 or time.perf_counter() <= deadline):
+            step(self.fixed_dt)
+            substeps += 1
+        busy = time.perf_counter() - start
+        self.busy_time += busy
+        if substeps:
+            step_time = busy * 1000 / substeps
+            self.step_time = step_time if self.step_time is None else 0.9 * self.step_time + 0.1 * step_time
+
+        self.accumulator -= substeps * self.fixed_dt
+        self.sim_time += substeps * self.fixed_dt
+
+        # Drop whatever could not be stepped this time instead of trying to catch up later
+        if self.accumulator >= self.fixed_dt:
+            dropped = self.accumulator - self.accumulator % self.fixed_dt
+            self.dropped_time += dropped
+            self.accumulator -= dropped
+
+        return substeps
+
+    def throughput(self):
+        """Returns the simulated seconds per wall-clock second since the last reset of the stats."""
+        wall_time = time.perf_counter() - self.start_time
+        if wall_time <= 0.0:
+            return 0.0
+        return (self.sim_time / 1000) / wall_time
+
+    def reachable(self, time_warp, frame_time, step_time=None):
+        """Returns whether the substeps of a frame of `frame_time` wall-clock ms at the given time warp fit into the
+        frame budget, judging by the given or else the measured step time in ms (only the time warp 1 counts as
+        reachable before any step)."""
+        step_time = self.step_time if step_time is None else step_time
+        if step_time is None:
+            return time_warp <= 1
+        substeps = time_warp * frame_time / self.fixed_dt
+        return substeps * step_time <= self.frame_budget or time_warp <= 1
+
+    def capacity(self):
+        """Returns the simulated seconds per wall-clock second spent stepping, the time warp the stepping alone
+        could reach without a frame budget."""
+        if self.busy_time <= 0.0:
+            return 0.0
+        return (self.sim_time / 1000) / self.busy_time
@@ -0,0 +1,500 @@
+from collections import namedtuple
+import numpy as np
+import actors
+from obstacles import Circle, Wall, boundary_walls
+from species import Species, boid_species, predator_species
+from timing import FixedStepper
+from vectors2d import Vector
+
+
+def normalize(vectors):
+    """Normalizes an array of 2D vectors (last axis), zero vectors stay zero like in Vector.normalize."""
+    length = np.hypot(vectors[..., 0], vectors[..., 1])
+    return vectors / np.where(length == 0.0, 1.0, length)[..., None]
+
+
+def orthonormal(vectors):
+    """The orthonormal vectors pointing to the right of the given ones, like Vector.orthonormal."""
+    return normalize(np.stack((vectors[..., 1], -vectors[..., 0]), axis=-1))
+
+
+def cross(a, b):
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def in_fov(heading, to_point, cos_half_view):
+    """Checks if the points given by the vectors `to_point` are in the field of view of actors facing `heading`
+    (both normalized). Same as Actor.in_fov, but compares cosines instead of angles."""
+    dot = heading[..., 0] * to_point[..., 0] + heading[..., 1] * to_point[..., 1]
+    return dot >= cos_half_view
+
+
+def sum_by(index, values, n):
+    """Sums the rows of `values` (2D vectors) that belong to the same index."""
+    return np.stack((np.bincount(index, weights=values[:, 0], minlength=n),
+                     np.bincount(index, weights=values[:, 1], minlength=n)), axis=-1)
+
+
+brute_force_pairs = 40000  # up to this many pairs, neighbor_pairs compares all of them instead of using the grid
+
+
+def neighbor_pairs(points, query, radius, window_size):
+    """Finds all pairs of points that are at most `radius` apart, using a uniform grid with cells of size `radius`.
+
+    `query` are the indices of the points to find the neighbors of. Returns the indices i (from query) and j (neighbor
+    of i, never i itself) and the vectors pointing from point i to point j. Small flocks (up to brute_force_pairs
+    pairs) compare every point with every other, which is faster than the grid for them."""
+    if len(query) * len(points) <= brute_force_pairs:
+        diff = points[None, :, :] - points[query][:, None, :]
+        close = diff[..., 0] ** 2 + diff[..., 1] ** 2 <= radius ** 2
+        close[np.arange(len(query)), query] = False
+        i, j = np.nonzero(close)
+        return query[i], j, diff[i, j]
+
+    # Points outside the window are put into the border cells, which doesn't change which cells are adjacent
+    bounds = np.array([window_size[0], window_size[1]])
+    cells = (np.clip(points, -radius, bounds + radius) // radius).astype(np.int64) + 1
+    n_cells_x, n_cells_y = (bounds + radius) // radius + 3
+    n_cells_x, n_cells_y = int(n_cells_x), int(n_cells_y)
+    keys = cells[:, 0] * n_cells_y + cells[:, 1]
+
+    order = np.argsort(keys, kind="stable")
+    counts = np.bincount(keys, minlength=n_cells_x * n_cells_y)
+    starts = np.cumsum(counts) - counts
+
+    all_i, all_j, all_diff = [], [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            other = cells[query] + (dx, dy)
+            valid = (other[:, 0] >= 0) & (other[:, 0] < n_cells_x) & (other[:, 1] >= 0) & (other[:, 1] < n_cells_y)
+            i = query[valid]
+            other_keys = other[valid, 0] * n_cells_y + other[valid, 1]
+
+            # every point i is paired with all the points in the other cell
+            n_candidates = counts[other_keys]
+            i = np.repeat(i, n_candidates)
+            first = np.repeat(starts[other_keys] - (np.cumsum(n_candidates) - n_candidates), n_candidates)
+            j = order[first + np.arange(len(i))]
+
+            diff = points[j] - points[i]
+            close = (diff[:, 0] ** 2 + diff[:, 1] ** 2 <= radius ** 2) & (i != j)
+            all_i.append(i[close])
+            all_j.append(j[close])
+            all_diff.append(diff[close])
+
+    return np.concatenate(all_i), np.concatenate(all_j), np.concatenate(all_diff)
+
+
+def calc_flocking(heading, i, j, diff, separation_radius, separation_strength, alignment_strength,
+                  cohesion_strength):
+    """Calculates the flocking forces of all the boids (see Boid.calc_flocking) from the pairs of boids (i, j) where
+    j is a neighbor of i and `diff` points from i to j. The parameters are scalars or have one value per boid."""
+    n = len(heading)
+    separation_radius, separation_strength, alignment_strength, cohesion_strength = (
+        np.broadcast_to(param, (n,)) for param in (separation_radius, separation_strength, alignment_strength,
+                                                   cohesion_strength))
+    dist_sq = diff[:, 0] ** 2 + diff[:, 1] ** 2
+    has_neighbors = (np.bincount(i, minlength=n) > 0)[:, None]
+
+    # separation: vectors pointing away from the close neighbors, stronger for closer ones
+    close = (dist_sq <= separation_radius[i] ** 2) & (dist_sq > 0.0)
+    away = -diff[close] / np.sqrt(dist_sq[close])[:, None]
+    separation = normalize(sum_by(i[close], away, n)) * separation_strength[:, None]
+
+    # alignment: the average direction every neighbor is facing (including self)
+    avg_direction = heading + sum_by(i, heading[j], n)
+    alignment = normalize(avg_direction) * alignment_strength[:, None]
+
+    # cohesion: towards the average position of the neighbors (including self)
+    cohesion = normalize(sum_by(i, diff, n)) * cohesion_strength[:, None]
+
+    return np.where(has_neighbors, separation + alignment + cohesion, 0.0)
+
+
+NO_OBSTACLE, WALL, CIRCLE = 0, 1, 2  # obstacle kinds in obstacle_arrays
+
+
+def obstacle_arrays(obstacles, size=None):
+    """Packs a list of obstacles into arrays: kind, start (of a wall, center of a circle), vector (of a wall),
+    length (of a wall) and squared radius (of a circle). The arrays are padded with NO_OBSTACLE up to `size`."""
+    size = len(obstacles) if size is None else size
+    kind = np.full(size, NO_OBSTACLE)
+    start = np.zeros((size, 2))
+    vector = np.tile((1.0, 0.0), (size, 1))
+    length = np.ones(size)
+    rad_sq = np.zeros(size)
+
+    for k, obstacle in enumerate(obstacles):
+        if type(obstacle) is Wall:
+            kind[k], start[k], vector[k], length[k] = WALL, obstacle.start, obstacle.vector, obstacle.length
+        elif type(obstacle) is Circle:
+            kind[k], start[k], rad_sq[k] = CIRCLE, obstacle.pos, obstacle.rad_sq
+
+    return kind, start, vector, length, rad_sq
+
+
+def find_threats(pos, ahead, kind, start, vector, length, rad_sq):
+    """Finds the closest obstacle in the way of every actor (see Actor.find_threat) and calculates the direction
+    divided by the distance in which the actor avoids it (see Actor.calc_avoidance). Returns the indices of the
+    obstacles (-1 if there is none) and the avoidance, multiply it by the avoidance strength to get the force.
+
+    pos and ahead have the shape (..., actors, 2), the obstacle arrays (see obstacle_arrays) (..., obstacles), where
+    the leading dimensions can be used for independent simulations."""
+    pos = pos[..., :, None, :]
+    ahead = ahead[..., :, None, :]
+    to_pos = pos - start[..., None, :, :]  # from the wall start or the circle center to the actor
+    kind, vector = kind[..., None, :], vector[..., None, :, :]
+    length, rad_sq = length[..., None, :], rad_sq[..., None, :]
+
+    # Walls: threat if the ahead vector crosses the wall
+    determinant = cross(vector, to_pos)
+    wall_dist_sq = np.maximum(0.0000001, (determinant / length) ** 2)
+    r_x_s = cross(vector, ahead)
+    parallel = np.abs(r_x_s) < 0.000001
+    r_x_s = np.where(parallel, 1.0, r_x_s)
+    t = cross(to_pos, ahead) / r_x_s
+    u = cross(to_pos, vector) / r_x_s
+    wall_threat = (kind == WALL) & ~parallel & (0 <= t) & (t <= 1) & (0 <= u) & (u <= 1)
+
+    # Circles: threat if the actor, the tip of its ahead vector or the middle of it is inside the circle
+    circle_dist_sq = np.maximum(0.0000001, (to_pos ** 2).sum(axis=-1) - rad_sq)
+    close_dist_sq = ((to_pos + ahead / 2) ** 2).sum(axis=-1)
+    far_dist_sq = ((to_pos + ahead) ** 2).sum(axis=-1)
+    circle_threat = (kind == CIRCLE) & ((close_dist_sq <= rad_sq) | (far_dist_sq <= rad_sq) |
+                                        (circle_dist_sq <= rad_sq))
+
+    # the closest threat is avoided (the first one if several are equally close, like in Actor.find_threat)
+    dist_sq = np.where(wall_threat, wall_dist_sq, np.where(circle_threat, circle_dist_sq, np.inf))
+    threat = np.argmin(dist_sq, axis=-1)[..., None]
+    has_threat = np.isfinite(np.take_along_axis(dist_sq, threat, axis=-1))
+
+    # away from a wall (orthogonal to it) or away from a circle center, stronger the closer the obstacle is
+    wall_direction = np.copysign(1.0, -determinant)[..., None] * orthonormal(vector)
+    direction = np.where((kind == WALL)[..., None], wall_direction, normalize(to_pos))
+    avoidance = direction / np.sqrt(np.where(np.isfinite(dist_sq), dist_sq, 1.0))[..., None]
+    avoidance = np.take_along_axis(avoidance, threat[..., None], axis=-2)[..., 0, :]
+
+    return np.where(has_threat, threat, -1)[..., 0], np.where(has_threat, avoidance, 0.0)
+
+
+def integrate(pos, v, forces, mass, max_speed, window_size, dt):
+    """Applies the forces and moves the actors, see Actor.update. Returns the new positions, velocities and speeds
+    (before actors outside the window are sent back to its center).
+
+    pos, v and forces have the shape (..., actors, 2), mass and max_speed (..., actors) or are scalars."""
+    mass = np.broadcast_to(mass, pos.shape[:-1])
+    max_speed = np.broadcast_to(max_speed, pos.shape[:-1])
+    v = v + forces / mass[..., None] * dt
+    speed = np.hypot(v[..., 0], v[..., 1])
+
+    # Clamp the velocity at maximum speed
+    too_fast = speed > max_speed
+    v = np.where(too_fast[..., None], normalize(v) * max_speed[..., None], v)
+    speed = np.where(too_fast, max_speed, speed)
+
+    # Actors outside the window head straight back to its center
+    outside = ((pos[..., 0] < 0) | (pos[..., 0] > window_size[0]) | (pos[..., 1] < 0) | (pos[..., 1] > window_size[1]))
+    to_center = normalize(np.array([window_size[0] / 2, window_size[1] / 2]) - pos) * max_speed[..., None]
+    v = np.where(outside[..., None], to_center, v)
+
+    return pos + v * dt, v, speed
+
+
+PredatorSettings = namedtuple("PredatorSettings", ("max_speed", "view_distance", "view_angle", "mass", "color"))
+
+
+def predator_settings(predator):
+    """The settings of a Predator (actors.py), predators with the same settings share a species."""
+    return PredatorSettings(predator.max_speed, predator.view_dist, predator.view_angle, predator.mass, predator.color)
+
+
+class VectorSimulation:
+    """Array based version of Simulation that supports several boid and predator species.
+
+    All the actors are stored in arrays (position, velocity, ...) together with per actor parameter tables that are
+    looked up from their species. The actors are sorted by species, boid species first, so every species and the flock
+    as a whole are contiguous slices of the arrays and a step never has to check the type of an actor."""
+
+    def __init__(self, window_size=(1, 1), nboids=10, boid=None, random=None):
+        self.window_size = Vector(window_size[0], window_size[1])
+        self.center = Vector(window_size[0]/2, window_size[1]/2)
+        self.obstacles = []
+        self.packed_obstacles = None  # the obstacles as arrays, see pack_obstacles()
+        self.nboids = nboids
+        self.boid = boid_species() if boid is None else boid  # the species created by setup()
+        self.stepper = FixedStepper(fixed_dt=20.0)  # fixed step size in ms, see advance()
+        self.random = np.random if random is None else random  # a np.random.RandomState, or the global one
+        self.clear_actors()
+
+    def clear_actors(self):
+        self.species = []  # all the species that were ever added, a species' index is its id
+        self.species_id = np.zeros(0, dtype=np.int64)
+        self.pos = np.zeros((0, 2))  # position
+        self.v = np.zeros((0, 2))  # velocity
+        self.speed = np.zeros(0)
+        self.ahead = np.zeros((0, 2))  # look ahead vector to avoid collision
+        self.flocking = np.zeros((0, 2))  # the flocking force, only updated every second frame
+        self.update_this_frame = np.zeros(0, dtype=bool)
+        self.params = {name: np.zeros(0) for name in Species.parameters}  # per actor parameter tables
+        self.n_boids = 0  # actors [0, n_boids) are boids, the rest are predators
+
+    def setup(self):
+        # Create four walls around the edges and add them to the obstacles
+        self.add_obstacles(*boundary_walls(self.window_size))
+
+        # Create random positions and velocities
+        x_vals = self.random.uniform(0, self.window_size.x, self.nboids)
+        y_vals = self.random.uniform(0, self.window_size.y, self.nboids)
+        positions = np.column_stack((x_vals, y_vals))
+        velocities = self.random.uniform(-1, 1, (self.nboids, 2))
+
+        # Populate the simulation with new boids
+        self.add_actors(self.boid, positions, velocities)
+
+    @classmethod
+    def from_simulation(cls, sim):
+        """Creates a VectorSimulation in the state of a Simulation (the object model), which shares its list of
+        obstacles. The rule strengths are the current ones of actors.py. Returns it together with the actors of the
+        Simulation in the order of the VectorSimulation (see copy_to)."""
+        vector_sim = cls(sim.window_size, 0, boid_species(**sim.boid_settings))
+        vector_sim.obstacles = sim.obstacles
+
+        # one species for every distinct predator
+        species = {}
+        for predator in sim.predators:
+            settings = predator_settings(predator)
+            if settings not in species:
+                species[settings] = predator_species(f"predator {len(species)}", **settings._asdict())
+
+        vector_sim.add_actors(vector_sim.boid, [tuple(boid.pos) for boid in sim.flock],
+                              [tuple(boid.v) for boid in sim.flock])
+        for predator in sim.predators:
+            vector_sim.add_actors(species[predator_settings(predator)], [tuple(predator.pos)], [tuple(predator.v)])
+        order = sim.flock + sorted(sim.predators, key=lambda predator: vector_sim.species.index(
+            species[predator_settings(predator)]))
+
+        vector_sim.v[:] = [tuple(actor.v) for actor in order]  # (add_actors sets them to the maximum speed)
+        vector_sim.speed[:] = [actor.speed for actor in order]
+        vector_sim.ahead[:] = [tuple(actor.ahead) for actor in order]
+        vector_sim.flocking[:] = [tuple(getattr(actor, "flocking", (0.0, 0.0))) for actor in order]
+        vector_sim.update_this_frame[:] = [actor.update_this_frame for actor in order]
+        return vector_sim, order
+
+    def copy_to(self, order):
+        """Copies the state back to the actors of a Simulation, given in the order returned by from_simulation."""
+        pos, v, speed, ahead = self.pos.tolist(), self.v.tolist(), self.speed.tolist(), self.ahead.tolist()
+        flocking, update_this_frame = self.flocking.tolist(), self.update_this_frame.tolist()
+        for k, actor in enumerate(order):
+            actor.pos = Vector(*pos[k])
+            actor.v = Vector(*v[k])
+            actor.speed = speed[k]
+            actor.ahead = Vector(*ahead[k])
+            actor.update_this_frame = update_this_frame[k]
+            actor.direction = actor.v.normalize()
+            del actor.dir_history[0]
+            actor.dir_history.append(actor.direction)
+            if k < self.n_boids:
+                actor.flocking = Vector(*flocking[k])
+                actor.change_color()
+
+    def add_obstacles(self, *args):
+        for obstacle in args:
+            self.obstacles.append(obstacle)
+
+    def delete_obstacles(self, *args):
+        for obstacle in args:
+            self.obstacles.remove(obstacle)
+
+    def clear_obstacles(self):
+        del self.obstacles[4:]
+
+    def add_actors(self, species, positions, velocities, update_this_frame=None):
+        """Adds one actor of the given species for every position and velocity. Raises a ValueError (and adds nothing)
+        if their numbers don't match."""
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        velocities = np.asarray(velocities, dtype=float).reshape(-1, 2)
+        n = len(positions)
+        if len(velocities) != n:
+            raise ValueError(f"{n} positions but {len(velocities)} velocities")
+        if update_this_frame is None:
+            update_this_frame = self.random.randint(0, 2, n).astype(bool)
+        elif len(update_this_frame) != n:
+            raise ValueError(f"{n} positions but {len(update_this_frame)} update_this_frame values")
+        if species not in self.species:
+            self.species.append(species)
+
+        v = normalize(velocities) * species.max_speed
+
+        self.species_id = np.concatenate((self.species_id, np.full(n, self.species.index(species))))
+        self.pos = np.concatenate((self.pos, positions))
+        self.v = np.concatenate((self.v, v))
+        self.speed = np.concatenate((self.speed, np.full(n, species.max_speed)))
+        self.ahead = np.concatenate((self.ahead, v * actors.look_ahead_time))
+        self.flocking = np.concatenate((self.flocking, np.zeros((n, 2))))
+        self.update_this_frame = np.concatenate((self.update_this_frame, update_this_frame))
+
+        # Keep the actors sorted by species (boids first), a stable sort keeps the order within a species
+        predator = np.array([s.predator for s in self.species])[self.species_id]
+        order = np.lexsort((self.species_id, predator))
+        for name in ("species_id", "pos", "v", "speed", "ahead", "flocking", "update_this_frame"):
+            setattr(self, name, getattr(self, name)[order])
+        self.n_boids = int(np.count_nonzero(~predator))
+
+        self.refresh_parameters()
+
+    def add_predator(self, position, velocity, species=None):
+        self.add_actors(predator_species() if species is None else species, [position], [velocity])
+
+    def refresh_parameters(self):
+        """Rebuilds the per actor parameter tables, call this after changing the parameters of a species."""
+        for name in Species.parameters:
+            table = np.array([getattr(species, name) for species in self.species])
+            self.params[name] = table[self.species_id] if len(table) else np.zeros(0)
+
+    def species_slice(self, species):
+        """Returns the slice of the actor arrays holding all the actors of the given species."""
+        species_id = self.species.index(species)
+        start = int(np.argmax(self.species_id == species_id)) if species_id in self.species_id else 0
+        return slice(start, start + int(np.count_nonzero(self.species_id == species_id)))
+
+    def colors(self):
+        """The display colors of all the actors, boids get redder the slower they are (like Boid.change_color)."""
+        colors = np.array([species.color for species in self.species], dtype=float)[self.species_id]
+        boids = slice(0, self.n_boids)
+        colors[boids, 0] = (1 - self.speed[boids] / self.params["max_speed"][boids]) * 255
+        return colors
+
+    def step(self, dt):
+        boids = slice(0, self.n_boids)
+        predators = slice(self.n_boids, len(self.pos))
+        forces = np.zeros_like(self.pos)
+
+        # only update the flocking force every second frame (of every boid)
+        update = np.flatnonzero(self.update_this_frame[boids])
+        if len(update):
+            self.flocking[update] = self.calc_flocking(update)
+
+        forces[boids] += self.flocking[boids]
+        forces[boids] += self.calc_evasion()
+        forces[predators] += self.calc_pursuit()
+        forces += self.calc_avoidance()
+
+        self.integrate(forces, dt)
+        self.update_this_frame = ~self.update_this_frame
+
+    def integrate(self, forces, dt):
+        """Updates the velocities and positions of all the actors."""
+        self.pos, self.v, self.speed = integrate(self.pos, self.v, forces, self.params["mass"],
+                                                 self.params["max_speed"], self.window_size, dt)
+        self.ahead = self.v * actors.look_ahead_time
+
+    def calc_flocking(self, update):
+        """Calculates the separation, alignment and cohesion of the boids with the given indices."""
+        boids = slice(0, self.n_boids)
+        i, j, diff = self.find_neighbors(update)
+        flocking = calc_flocking(normalize(self.v[boids]), i, j, diff,
+                                 *(self.params[name][boids] for name in ("separation_radius", "separation_strength",
+                                                                         "alignment_strength", "cohesion_strength")))
+        return flocking[update]
+
+    def find_neighbors(self, update):
+        """Finds all the neighbors of the boids with the given indices: the boids of the same species they can see.
+        Returns the pairs of boids (i, j) where j is a neighbor of i and the vectors pointing from i to j."""
+        boids = slice(0, self.n_boids)
+        pos, species_id = self.pos[boids], self.species_id[boids]
+        view_dist = self.params["view_distance"][boids]
+        cos_half_view = np.cos(self.params["view_angle"][boids] / 2)
+        heading = normalize(self.v[boids])
+
+        i, j, diff = neighbor_pairs(pos, update, view_dist.max(), self.window_size)
+        dist_sq = diff[:, 0] ** 2 + diff[:, 1] ** 2
+        neighbor = ((species_id[i] == species_id[j]) & (dist_sq <= view_dist[i] ** 2) &
+                    in_fov(heading[i], normalize(diff), cos_half_view[i]))
+        return i[neighbor], j[neighbor], diff[neighbor]
+
+    def calc_evasion(self):
+        """Calculates the evasion force which makes the boids evade the closest visible predator."""
+        boids = slice(0, self.n_boids)
+        predators = slice(self.n_boids, len(self.pos))
+        if self.n_boids == len(self.pos):
+            return np.zeros((self.n_boids, 2))
+
+        pos = self.pos[boids]
+        threat_pos, threat_v = self.pos[predators], self.v[predators]
+        diff = threat_pos[None, :, :] - pos[:, None, :]
+        dist_sq = diff[..., 0] ** 2 + diff[..., 1] ** 2
+        visible = ((dist_sq <= self.params["view_distance"][boids, None] ** 2) &
+                   in_fov(normalize(self.v[boids])[:, None, :], normalize(diff),
+                          np.cos(self.params["view_angle"][boids, None] / 2)))
+
+        dist_sq = np.where(visible, dist_sq, np.inf)
+        threat = np.argmin(dist_sq, axis=1)
+        dist_sq = dist_sq[np.arange(len(pos)), threat]
+        has_threat = np.isfinite(dist_sq)
+        threat_pos, threat_v = threat_pos[threat], threat_v[threat]
+
+        # evade to the side of the predator's path the boid is on
+        side = np.copysign(1.0, -cross(threat_v, pos - threat_pos))
+        direction = side[:, None] * orthonormal(threat_v)
+        distance = np.sqrt(np.maximum(np.where(has_threat, dist_sq, 1.0), 0.0000001))
+        evasion = direction * (self.params["evasion_strength"][boids] / distance)[:, None]
+        return np.where(has_threat[:, None], evasion, 0.0)
+
+    def calc_pursuit(self):
+        """Calculates the pursuit force which makes the predators pursue the closest visible boid. Like the flocking,
+        it is only applied every second frame."""
+        boids = slice(0, self.n_boids)
+        predators = slice(self.n_boids, len(self.pos))
+        n_predators = len(self.pos) - self.n_boids
+        if n_predators == 0 or self.n_boids == 0:
+            return np.zeros((n_predators, 2))
+
+        pos = self.pos[predators]
+        diff = self.pos[None, boids, :] - pos[:, None, :]
+        dist_sq = diff[..., 0] ** 2 + diff[..., 1] ** 2
+        visible = ((dist_sq <= self.params["view_distance"][predators, None] ** 2) &
+                   in_fov(normalize(self.v[predators])[:, None, :], normalize(diff),
+                          np.cos(self.params["view_angle"][predators, None] / 2)))
+
+        dist_sq = np.where(visible, dist_sq, np.inf)
+        target = np.argmin(dist_sq, axis=1)
+        dist_sq = dist_sq[np.arange(n_predators), target]
+        pursue = np.isfinite(dist_sq) & self.update_this_frame[predators]
+
+        # aim at where the target will be
+        direction = normalize(self.pos[target] + self.v[target] * actors.look_ahead_time - pos)
+        distance = np.sqrt(np.maximum(np.where(pursue, dist_sq, 1.0), 0.0000001))
+        pursuit = direction * (self.params["pursuit_strength"][predators] / distance)[:, None]
+        return np.where(pursue[:, None], pursuit, 0.0)
+
+    def calc_avoidance(self):
+        """Calculates the force which makes every actor avoid the closest obstacle in its way."""
+        if not self.obstacles or len(self.pos) == 0:
+            return np.zeros_like(self.pos)
+        avoidance = find_threats(self.pos, self.ahead, *self.pack_obstacles())[1]
+        return avoidance * self.params["avoidance_strength"][:, None]
+
+    def find_threats(self):
+        """Returns the index of the closest obstacle in the way of every actor (-1 if there is none)."""
+        if not self.obstacles or len(self.pos) == 0:
+            return np.full(len(self.pos), -1)
+        return find_threats(self.pos, self.ahead, *self.pack_obstacles())[0]
+
+    def pack_obstacles(self):
+        """Returns the obstacles as arrays (see obstacle_arrays), which are only packed again after they changed."""
+        key = tuple(self.obstacles)  # (obstacles compare by identity)
+        if self.packed_obstacles is None or self.packed_obstacles[0] != key:
+            self.packed_obstacles = (key, obstacle_arrays(self.obstacles))
+        return self.packed_obstacles[1]
+
+    def advance(self, elapsed):
+        """Advances the simulation by `elapsed` ms of wall-clock time (sped up by the time warp) in fixed steps."""
+        return self.stepper.advance(self.step, elapsed)
+
+    def set_time_warp(self, time_warp):
+        self.stepper.set_time_warp(time_warp)
+
+    def reset(self):
+        self.clear_actors()
+        self.obstacles = []
+        self.setup()